@@ -78,7 +78,11 @@ export class SessionManager {
 
     const child = spawn('bash', ['-c', `${limits} && ${innerCmd}`], {
       cwd: workingDir,
-      env: getStrippedEnv(),
+      env: {
+        ...getStrippedEnv(),
+        // Wrappers bound expression reprs to the parent's output limit
+        CODEXEC_MAX_OUTPUT_CHARS: String(config.maxOutputChars),
+      },
       stdio: ['pipe', 'pipe', 'pipe'],
     });
 
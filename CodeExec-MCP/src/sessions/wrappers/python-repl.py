@@ -11,49 +11,105 @@ Protocol:
   Wrapper executes the code, then prints:
     __CODEXEC_DONE_<uuid8>__
 """
+import ast
+import functools
+import os
+import re
+import reprlib
 import sys
 import traceback
 
+# Parent truncates per-exec output to this many chars (config.maxOutputChars);
+# materializing reprs far beyond it is wasted allocation — a huge list or
+# string would otherwise build a multi-MB repr only to be chopped to ~10 KB
+_MAX_OUTPUT = int(os.environ.get('CODEXEC_MAX_OUTPUT_CHARS') or 10_000)
+
+_big_repr = reprlib.Repr()
+_big_repr.maxstring = _big_repr.maxother = _MAX_OUTPUT
+_big_repr.maxlist = _big_repr.maxtuple = _big_repr.maxset = \
+    _big_repr.maxfrozenset = _big_repr.maxdict = _big_repr.maxarray = _MAX_OUTPUT
+
+
+def _repr(result):
+    """repr() that elides results too large for the parent to keep anyway."""
+    try:
+        huge = len(result) > _MAX_OUTPUT
+    except TypeError:
+        huge = False
+    return _big_repr.repr(result) if huge else repr(result)
+
+
+# Boundary lines look like: __CODEXEC_BOUNDARY_<uuid8>__\n
+# The lookbehind anchors the marker to the start of its own line, so a
+# single search suffices — no post-hoc line-start verification
+_BOUNDARY_RE = re.compile(rb'(?:\A|(?<=\n))__CODEXEC_BOUNDARY_([0-9a-f]+)__\n')
+
+# Done sentinel template — bytes %-formatting against the captured uuid,
+# no str decode/encode round trip per block
+_DONE_FMT = b'__CODEXEC_DONE_%s__\n'
+
+
+@functools.lru_cache(maxsize=512)
+def _compile(code):
+    """Compile a block once and cache the result.
+
+    Returns (code_object, is_expression). Repeated blocks (common in
+    interactive sessions) skip the parse and compile on subsequent
+    executions. Classification goes through ast.parse rather than a
+    SyntaxError-driven eval/exec probe, so statement blocks don't pay
+    for raising and catching an exception.
+    """
+    tree = ast.parse(code, '<session>', 'exec')
+    if len(tree.body) == 1 and isinstance(tree.body[0], ast.Expr):
+        expression = ast.Expression(tree.body[0].value)
+        return compile(expression, '<session>', 'eval'), True
+    return compile(tree, '<session>', 'exec'), False
+
 
 def main():
-    while True:
-        lines = []
-        boundary = None
+    stdin = sys.stdin.buffer
+    buf = bytearray()
 
-        for line in sys.stdin:
-            line = line.rstrip('\n')
-            if line.startswith('__CODEXEC_BOUNDARY_') and line.endswith('__'):
-                boundary = line.replace('BOUNDARY', 'DONE')
+    # Dedicated session namespace: defined names persist across blocks and
+    # recursive functions can reference themselves, without churning the
+    # wrapper's own module globals on every exec
+    session_ns = {'__name__': '__main__', '__builtins__': __builtins__}
+
+    while True:
+        match = _BOUNDARY_RE.search(buf)
+        if match is None:
+            chunk = stdin.read1(65536)
+            if not chunk:
+                # stdin closed — exit cleanly
                 break
-            lines.append(line)
+            buf += chunk
+            continue
 
-        if boundary is None:
-            # stdin closed — exit cleanly
-            break
+        code = bytes(buf[:match.start()]).decode('utf-8')
+        done = _DONE_FMT % match.group(1)
+        del buf[:match.end()]
 
-        code = '\n'.join(lines)
         if not code.strip():
-            print(boundary, flush=True)
+            os.write(1, done)
             continue
 
         try:
-            # Use module globals for exec/eval so defined names persist
-            # and recursive functions can reference themselves
-            g = globals()
-            # Try eval first for expressions (e.g. "2+2" → prints "4")
-            try:
-                result = eval(compile(code, '<session>', 'eval'), g)
+            code_obj, is_expression = _compile(code)
+            if is_expression:
+                # Expressions print their repr (e.g. "2+2" → prints "4")
+                result = eval(code_obj, session_ns)
                 if result is not None:
-                    print(repr(result))
-            except SyntaxError:
-                # Not an expression — execute as statements
-                exec(compile(code, '<session>', 'exec'), g)
+                    print(_repr(result))
+            else:
+                exec(code_obj, session_ns)
         except Exception:
             traceback.print_exc()
         finally:
+            # Flush buffered output first, then emit the sentinel straight
+            # to fd 1 — no text-IO encode/buffer round trip
             sys.stdout.flush()
             sys.stderr.flush()
-            print(boundary, flush=True)
+            os.write(1, done)
 
 
 if __name__ == '__main__':
@@ -12,10 +12,10 @@ Skips: --amend, merge commits, non-commit bash commands.
 Configured in .claude/settings.json as a PreToolUse hook with matcher "Bash".
 """
 import json
+import os
 import re
 import subprocess
 import sys
-from datetime import datetime
 from pathlib import Path
 
 # Conventional commit prefix → Keep a Changelog section
@@ -33,6 +33,9 @@ PREFIX_MAP = {
 }
 DEFAULT_SECTION = "Changed"
 
+# Bound once — classify_message hits this on every commit
+_section_for_prefix = PREFIX_MAP.get
+
 CHANGELOG_HEADER = """\
 # Changelog
 
@@ -47,15 +50,35 @@ Format based on [Keep a Changelog](https://keepachangelog.com/).
 """
 
 # Root-level files/dirs that aren't packages
-NON_PACKAGE_PATHS = {
+NON_PACKAGE_PATHS = frozenset({
     "_scripts", ".claude", "docs", ".git", ".github",
     "node_modules", ".vscode",
-}
+})
+
+# Compiled once at import — the hook runs on every Bash tool call, so
+# per-call re.compile churn adds up
+GIT_COMMIT_RE = re.compile(r"^git\s+commit\b")
+HEREDOC_RE = re.compile(r"<<'?EOF'?\s*\n(.+?)\n\s*EOF", re.DOTALL)
+M_QUOTED_RE = re.compile(r'''-m\s+["'](.+?)["']''', re.DOTALL)
+M_WORD_RE = re.compile(r"-m\s+(\S+)")
+PREFIX_RE = re.compile(r"^(\w+)(?:\(.+?\))?:\s*(.+)")
+SUBSECTION_RE = re.compile(r"^### (.+)", re.MULTILINE)
+
+# Conventional changelog section order; unknown sections sort last
+SECTION_ORDER = (
+    "Added", "Changed", "Fixed", "Removed",
+    "Documentation", "Performance", "Maintenance",
+)
+SECTION_RANK = {name: i for i, name in enumerate(SECTION_ORDER)}
 
 
 def parse_commit_command(command: str) -> str | None:
     """Extract commit message from a git commit command. Returns None if not a commit."""
-    if not re.match(r"^git\s+commit\b", command):
+    # Cheap prefix gate first — the hook sees every Bash command and almost
+    # none of them are git commits
+    if not command.startswith("git"):
+        return None
+    if not GIT_COMMIT_RE.match(command):
         return None
     if "--amend" in command:
         return None
@@ -64,7 +87,7 @@ def parse_commit_command(command: str) -> str | None:
 
     # Match -m with various quoting styles (HEREDOC, single, double quotes)
     # Claude Code often uses HEREDOC: git commit -m "$(cat <<'EOF'\nmessage\nEOF\n)"
-    heredoc = re.search(r"<<'?EOF'?\s*\n(.+?)\n\s*EOF", command, re.DOTALL)
+    heredoc = HEREDOC_RE.search(command)
     if heredoc:
         # Extract just the first line (commit title) from HEREDOC messages
         full_msg = heredoc.group(1).strip()
@@ -72,12 +95,12 @@ def parse_commit_command(command: str) -> str | None:
         return full_msg.split("\n")[0].strip()
 
     # Standard -m "message" or -m 'message'
-    match = re.search(r'''-m\s+["'](.+?)["']''', command, re.DOTALL)
+    match = M_QUOTED_RE.search(command)
     if match:
         return match.group(1).split("\n")[0].strip()
 
     # -m message (unquoted, single word — unlikely but handle it)
-    match = re.search(r"-m\s+(\S+)", command)
+    match = M_WORD_RE.search(command)
     if match:
         return match.group(1)
 
@@ -86,10 +109,10 @@ def parse_commit_command(command: str) -> str | None:
 
 def classify_message(message: str) -> tuple[str, str]:
     """Return (section, cleaned_message) from a commit message."""
-    match = re.match(r"^(\w+)(?:\(.+?\))?:\s*(.+)", message)
+    match = PREFIX_RE.match(message)
     if match:
         prefix = match.group(1).lower()
-        section = PREFIX_MAP.get(prefix, DEFAULT_SECTION)
+        section = _section_for_prefix(prefix, DEFAULT_SECTION)
         return section, match.group(2).strip()
     return DEFAULT_SECTION, message.strip()
 
@@ -113,11 +136,9 @@ def get_affected_packages(cwd: str) -> list[str]:
         # Exclude CHANGELOG.md itself to avoid self-referencing
         if filepath == "CHANGELOG.md":
             continue
-        top_dir = filepath.split("/")[0]
-        if "/" not in filepath:
-            # Root-level file
-            packages.add("core")
-        elif top_dir in NON_PACKAGE_PATHS:
+        top_dir, sep, _ = filepath.partition("/")
+        if not sep or top_dir in NON_PACKAGE_PATHS:
+            # Root-level file, or a non-package dir — both count as core
             packages.add("core")
         else:
             packages.add(top_dir)
@@ -133,94 +154,70 @@ def format_entry(packages: list[str], message: str) -> str:
     return f"- {message}"
 
 
-def update_changelog(changelog_path: Path, section: str, entry: str, today: str) -> None:
+def update_changelog(changelog_path: Path, section: str, entry: str) -> None:
     """Insert an entry into the changelog under ## [Unreleased] / ### Section."""
     if not changelog_path.exists():
         changelog_path.write_text(CHANGELOG_HEADER, encoding="utf-8")
 
     content = changelog_path.read_text(encoding="utf-8")
 
-    # Parse the [Unreleased] block out of the full content
-    unreleased_match = re.search(
-        r"(## \[Unreleased\]\n)(.*?)(?=\n## \[|\Z)",
-        content,
-        re.DOTALL,
-    )
-    if not unreleased_match:
+    # Locate the [Unreleased] block with plain substring scans — no DOTALL
+    # regex backtracking over the full file
+    heading = "## [Unreleased]\n"
+    start = content.find(heading)
+    if start == -1:
         # No [Unreleased] section — find where to insert one
-        first_version = re.search(r"\n## \[", content)
-        if first_version:
-            pos = first_version.start()
-            content = content[:pos] + "\n## [Unreleased]\n\n" + content[pos:]
+        first_version = content.find("\n## [")
+        if first_version != -1:
+            content = content[:first_version] + "\n## [Unreleased]\n\n" + content[first_version:]
         else:
             content = content.rstrip("\n") + "\n\n## [Unreleased]\n\n"
-        unreleased_match = re.search(
-            r"(## \[Unreleased\]\n)(.*?)(?=\n## \[|\Z)",
-            content,
-            re.DOTALL,
+        start = content.find(heading)
+
+    body_start = start + len(heading)
+    next_version = content.find("\n## [", body_start)
+    body_end = len(content) if next_version == -1 else next_version
+    unreleased_body = content[body_start:body_end]
+
+    # Insert the entry in place — no parsing every subsection into a dict
+    # and re-serializing the whole block
+    sub_heading = f"### {section}\n"
+
+    if not unreleased_body.strip():
+        # Empty block — write the first subsection directly under the heading
+        new_content = (
+            content[:body_start] + "\n" + sub_heading + entry + "\n"
+            + content[body_end:]
         )
+    else:
+        sub_pos = unreleased_body.find(sub_heading)
+        if sub_pos != -1:
+            # Existing subsection — newest first, right under its heading
+            insert_at = body_start + sub_pos + len(sub_heading)
+            new_content = content[:insert_at] + entry + "\n" + content[insert_at:]
+        else:
+            # New subsection — place it according to the conventional order
+            rank = SECTION_RANK.get(section, len(SECTION_ORDER))
+            insert_at = body_end
+            block = "\n" + sub_heading + entry + "\n"
+            for sub_match in SUBSECTION_RE.finditer(unreleased_body):
+                if SECTION_RANK.get(sub_match.group(1), len(SECTION_ORDER)) > rank:
+                    insert_at = body_start + sub_match.start()
+                    block = sub_heading + entry + "\n\n"
+                    break
+            new_content = content[:insert_at] + block + content[insert_at:]
+
+    changelog_path.write_text(new_content, encoding="utf-8")
 
-    unreleased_heading = unreleased_match.group(1)
-    unreleased_body = unreleased_match.group(2)
-
-    # Parse existing subsections within [Unreleased]
-    # Each subsection: ### Name\n- entry\n- entry\n
-    subsections: dict[str, list[str]] = {}
-    current_sub = None
-    for line in unreleased_body.splitlines():
-        heading_match = re.match(r"^### (.+)", line)
-        if heading_match:
-            current_sub = heading_match.group(1)
-            if current_sub not in subsections:
-                subsections[current_sub] = []
-        elif line.startswith("- ") and current_sub:
-            subsections[current_sub].append(line)
-
-    # Add the new entry
-    if section not in subsections:
-        subsections[section] = []
-    subsections[section].insert(0, entry)  # newest first
-
-    # Rebuild the [Unreleased] block with consistent formatting
-    # Order subsections by conventional changelog order
-    section_order = [
-        "Added", "Changed", "Fixed", "Removed",
-        "Documentation", "Performance", "Maintenance",
-    ]
-    ordered_sections = []
-    for s in section_order:
-        if s in subsections:
-            ordered_sections.append(s)
-    for s in subsections:
-        if s not in ordered_sections:
-            ordered_sections.append(s)
-
-    new_body_parts = []
-    for s in ordered_sections:
-        new_body_parts.append(f"### {s}")
-        for e in subsections[s]:
-            new_body_parts.append(e)
-        new_body_parts.append("")  # blank line after each subsection
-
-    new_unreleased = unreleased_heading + "\n" + "\n".join(new_body_parts)
-
-    # Replace the old [Unreleased] block in the full content
-    before = content[: unreleased_match.start()]
-    after = content[unreleased_match.end() :]
-
-    # Ensure a blank line before the next ## heading
-    if after and not after.startswith("\n"):
-        after = "\n" + after
-
-    changelog_path.write_text(before + new_unreleased + after, encoding="utf-8")
-
-
-def stage_changelog(cwd: str, changelog_path: Path) -> None:
+
+def stage_changelog(repo_root: Path) -> None:
     """Stage CHANGELOG.md so it's included in the commit."""
     try:
+        # Run from the already-known repo root with a relative path — git
+        # finds .git in one stat instead of walking up from a subdirectory
         subprocess.run(
-            ["git", "add", str(changelog_path)],
-            capture_output=True, cwd=cwd, timeout=5,
+            ["git", "add", "CHANGELOG.md"],
+            capture_output=True, cwd=repo_root, timeout=5,
         )
     except (subprocess.TimeoutExpired, FileNotFoundError):
         pass
@@ -245,23 +242,32 @@ def main() -> None:
     if not cwd:
         sys.exit(0)
 
-    section, cleaned_message = classify_message(commit_message)
     packages = get_affected_packages(cwd)
+    if not packages:
+        # Nothing staged (or git unavailable) — the commit will fail or be
+        # empty, so skip the changelog read/write/stage entirely
+        sys.exit(0)
+
+    section, cleaned_message = classify_message(commit_message)
     entry = format_entry(packages, cleaned_message)
-    today = datetime.now().strftime("%Y-%m-%d")
-
-    # Find the repo root (where CHANGELOG.md should live)
-    repo_root = Path(cwd)
-    while repo_root != repo_root.parent:
-        if (repo_root / ".git").exists():
-            break
-        repo_root = repo_root.parent
+
+    # Find the repo root (where CHANGELOG.md should live). Claude Code
+    # exports the project root — use it and skip the .git stat walk
+    env_root = os.environ.get("CLAUDE_PROJECT_DIR")
+    if env_root:
+        repo_root = Path(env_root)
     else:
-        sys.exit(0)
+        cwd_path = Path(cwd)
+        repo_root = next(
+            (p for p in (cwd_path, *cwd_path.parents) if (p / ".git").exists()),
+            None,
+        )
+        if repo_root is None:
+            sys.exit(0)
 
     changelog_path = repo_root / "CHANGELOG.md"
-    update_changelog(changelog_path, section, entry, today)
-    stage_changelog(cwd, changelog_path)
+    update_changelog(changelog_path, section, entry)
+    stage_changelog(repo_root)
 
     # Exit 0 — allow the commit to proceed
     sys.exit(0)